@@ -5,16 +5,50 @@ Scrapes product data and images with intelligent folder merging.
 """
 
 import argparse
+import hashlib
 import json
 import os
 import re
 import sys
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from email.utils import formatdate
 from pathlib import Path
 from urllib.parse import urljoin, urlparse
 import requests
-from bs4 import BeautifulSoup
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+from bs4 import BeautifulSoup, FeatureNotFound, NavigableString, SoupStrainer
 import markdownify as md
 
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    from lxml import etree
+    from lxml import html as lxml_html
+except ImportError:
+    etree = lxml_html = None
+
+
+def _url_ext(url):
+    """Lowercase extension of the URL path, ignoring any query or fragment"""
+    end = len(url)
+    for sep in ('?', '#'):
+        pos = url.find(sep, 0, end)
+        if pos >= 0:
+            end = pos
+    start = url.rfind('/', 0, end) + 1
+    dot = url.rfind('.', start, end)
+    return url[dot:end].lower() if dot >= 0 else ''
+
+
+def _has_class(name):
+    """XPath predicate matching elements that carry the given CSS class"""
+    return f"contains(concat(' ', normalize-space(@class), ' '), ' {name} ')"
+
 
 class KiloWebScraper:
     """Web scraper for Kilo International website"""
@@ -32,13 +66,62 @@ class KiloWebScraper:
         'trainings'
     ]
     
+    # Maximum number of files downloaded at the same time
+    MAX_CONCURRENT_DOWNLOADS = 16
+    
+    # Extensions that mark an image as a block diagram
+    _PNG_EXTS = frozenset({'.png'})
+    
+    # Only these tags (with everything inside them) are kept when parsing a page;
+    # div covers #page-wrapper, so the markdown sections stay intact
+    _STRAINER = SoupStrainer(['a', 'img', 'li', 'ul', 'h1', 'meta', 'div', 'button', 'p'])
+    
+    # Compiled XPath expressions for category grid items (lxml only)
+    if etree is not None:
+        _PRODUCT_LIST_XP = etree.XPath(f"//*[{_has_class('productList')}]")
+        _GRID_LINKS_PROBE_XP = etree.XPath(f"(//a[{_has_class('grid-item-link')}])[position() <= 2]")
+        _GRID_ITEM_XP = etree.XPath(f".//li[{_has_class('grid-item')}]")
+        _LINK_XP = etree.XPath(f".//a[{_has_class('grid-item-link')}]")
+        _TITLE_XP = etree.XPath(f".//div[{_has_class('grid-item-title')}]")
+        _IMG_XP = etree.XPath(f".//img[{_has_class('product-image')}]")
+        _PRICE_XP = etree.XPath(f".//div[{_has_class('grid-item-price')}]")
+        _TEXT_XP = etree.XPath(".//text()")
+    
+    # Shared HTML → Markdown converter
+    _MARKDOWN_CONVERTER = md.MarkdownConverter(heading_style="ATX")
+    
+    # Unicode non-breaking spaces become plain spaces
+    _NBSP_TRANS = str.maketrans({'\xa0': ' '})
+    
+    # Target URL of onclick="location.href='...'" buttons
+    _ONCLICK_HREF_RE = re.compile(r"location\.href\s*=\s*['\"]([^'\"]+)['\"]")
+    
+    # Newline runs with the horizontal whitespace around them
+    _NORMALIZE_RE = re.compile(r"[^\S\n]*(\n+)[^\S\n]*")
+    
     def __init__(self, url, output_dir):
         self.url = url
         self.output_dir = Path(output_dir)
         self.session = requests.Session()
         self.session.headers.update({
-            'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36'
+            'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36',
+            'Connection': 'keep-alive'
         })
+        # Reuse persistent connections to the CDN and retry transient failures
+        retries = Retry(total=3, backoff_factor=0.3, status_forcelist=[429, 500, 502, 503, 504])
+        adapter = HTTPAdapter(
+            pool_connections=8,
+            pool_maxsize=self.MAX_CONCURRENT_DOWNLOADS * 2,
+            max_retries=retries
+        )
+        self.session.mount('http://', adapter)
+        self.session.mount('https://', adapter)
+        # Guards filename selection while downloads run concurrently
+        self._file_lock = threading.Lock()
+        # Filenames present in each download directory, scanned once per directory
+        self._dir_index = {}
+        # Per-URL metadata records holding ETag/Last-Modified for conditional GETs
+        self.validators = {}
         
     def fetch_page(self, url):
         """Fetch page content"""
@@ -50,6 +133,14 @@ class KiloWebScraper:
             print(f"Error fetching {url}: {e}")
             return None
     
+    def parse_html(self, html, strained=True):
+        """Parse HTML with lxml, falling back to html.parser if lxml is missing"""
+        parse_only = self._STRAINER if strained else None
+        try:
+            return BeautifulSoup(html, 'lxml', parse_only=parse_only)
+        except FeatureNotFound:
+            return BeautifulSoup(html, 'html.parser', parse_only=parse_only)
+    
     def create_folder_structure(self):
         """Create all subdirectories and their specific json files"""
         print("Creating folder structure...")
@@ -85,75 +176,129 @@ class KiloWebScraper:
                 for filename in dir_files[subdir]:
                     file_path = subdir_path / filename
                     if not file_path.exists():
-                        initial_content = {} if filename == 'products.json' else []
+                        # Products and image metadata are keyed objects, the rest are lists
+                        if filename == 'products.json' or subdir in ('images', 'block_diagrams'):
+                            initial_content = {}
+                        else:
+                            initial_content = []
                         with open(file_path, 'w', encoding='utf-8') as f:
                             json.dump(initial_content, f)
     
     def is_logo_image(self, url):
         if not url:
             return False
-        url_lower = url.lower()
-        if 'logo' in url_lower or '_logo_' in url_lower or 'logo-' in url_lower or '-logo' in url_lower:
-            return True
-        filename = os.path.basename(urlparse(url).path).lower()
-        return 'logo' in filename
+        # Any 'logo' in the URL also covers its filename, so no need to parse it
+        return 'logo' in url.lower()
     
-    def detect_page_type(self, soup):
+    def parse_tree(self, html):
+        """Parse HTML into an lxml tree, or return None if lxml is unavailable or fails"""
+        if lxml_html is None or not html:
+            return None
+        try:
+            return lxml_html.fromstring(html)
+        except (ValueError, etree.ParserError):
+            return None
+    
+    def detect_page_type(self, soup, tree=None):
+        """Return the page type and the productList node (or None), taken from tree when given"""
+        if tree is not None:
+            product_lists = self._PRODUCT_LIST_XP(tree)
+            if product_lists:
+                return 'category', product_lists[0]
+            if len(self._GRID_LINKS_PROBE_XP(tree)) > 1:
+                return 'category', None
+            return 'product_detail', None
+        
         product_list = soup.find(class_='productList')
         if product_list:
-            return 'category'
+            return 'category', product_list
         
-        product_items = soup.find_all('a', class_='grid-item-link')
+        # Two links are enough to tell a category grid apart
+        product_items = soup.find_all('a', class_='grid-item-link', limit=2)
         
         if len(product_items) > 1:
-            return 'category'
+            return 'category', None
+        else:
+            return 'product_detail', None
+    
+    def _category_items_soup(self, soup, product_list=None):
+        """Extract (link, title, image, price) for each grid item using BeautifulSoup"""
+        if product_list:
+            product_items = product_list.find_all('li', class_='grid-item')
         else:
-            return 'product_detail'
+            product_items = soup.find_all('li', class_='grid-item')
+        
+        items = []
+        for item in product_items:
+            link_elem = item.find('a', class_='grid-item-link')
+            title_elem = item.find('div', class_='grid-item-title')
+            img_elem = item.find('img', class_='product-image')
+            price_elem = item.find('div', class_='grid-item-price')
+            items.append((
+                link_elem.get('href', '') if link_elem else None,
+                title_elem.get_text(strip=True) if title_elem else None,
+                (img_elem.get('data-src') or img_elem.get('src')) if img_elem else None,
+                price_elem.get_text(strip=True) if price_elem else None
+            ))
+        return items
+    
+    def _category_items_lxml(self, root):
+        """Extract (link, title, image, price) for each grid item under root with compiled XPath"""
+        product_items = self._GRID_ITEM_XP(root)
+        
+        def first(xpath, item):
+            found = xpath(item)
+            return found[0] if found else None
+        
+        def text(elem):
+            if elem is None:
+                return None
+            return ''.join(t.strip() for t in self._TEXT_XP(elem))
+        
+        items = []
+        for item in product_items:
+            link_elem = first(self._LINK_XP, item)
+            img_elem = first(self._IMG_XP, item)
+            items.append((
+                link_elem.get('href', '') if link_elem is not None else None,
+                text(first(self._TITLE_XP, item)),
+                (img_elem.get('data-src') or img_elem.get('src')) if img_elem is not None else None,
+                text(first(self._PRICE_XP, item))
+            ))
+        return items
     
-    def scrape_category_page(self, soup):
+    def scrape_category_page(self, soup, product_list=None, tree=None):
         products = {}
         images = []
         block_diagrams = []
         
-        product_list = soup.find(class_='productList')
-        if product_list:
-            product_items = product_list.find_all('li', class_='grid-item')
+        # product_list comes from the same backend detect_page_type used
+        if tree is not None:
+            product_items = self._category_items_lxml(product_list if product_list is not None else tree)
         else:
-            product_items = soup.find_all('li', class_='grid-item')
+            product_items = self._category_items_soup(soup, product_list)
         
         print(f"Found {len(product_items)} product items in category page")
         
-        for item in product_items:
-            link_elem = item.find('a', class_='grid-item-link')
-            if not link_elem:
+        for product_link, product_name, image_url, price in product_items:
+            if product_link is None:
                 continue
             
-            product_link = link_elem.get('href', '')
             if product_link:
                 product_link = urljoin(self.url, product_link)
             
-            title_elem = item.find('div', class_='grid-item-title')
-            product_name = title_elem.get_text(strip=True) if title_elem else 'Unknown Product'
-            
-            # Extract product image using product-image class
-            img_elem = item.find('img', class_='product-image')
-            image_url = None
-            if img_elem:
-                image_url = img_elem.get('data-src') or img_elem.get('src')
-                if image_url:
-                    image_url = urljoin(self.url, image_url)
-                    if not self.is_logo_image(image_url):
-                        # Check extension to separate block diagrams (PNG) from product images
-                        parsed = urlparse(image_url)
-                        path = parsed.path.lower()
-                        
-                        if path.endswith('.png'):
-                            block_diagrams.append(image_url)
-                        else:
-                            images.append(image_url)
+            if product_name is None:
+                product_name = 'Unknown Product'
             
-            price_elem = item.find('div', class_='grid-item-price')
-            price = price_elem.get_text(strip=True) if price_elem else None
+            # Product image comes from the product-image class
+            if image_url:
+                image_url = urljoin(self.url, image_url)
+                if not self.is_logo_image(image_url):
+                    # Check extension to separate block diagrams (PNG) from product images
+                    if _url_ext(image_url) in self._PNG_EXTS:
+                        block_diagrams.append(image_url)
+                    else:
+                        images.append(image_url)
             
             products[product_name] = {
                 'Product': product_name,
@@ -167,35 +312,87 @@ class KiloWebScraper:
         
         return products, images, block_diagrams
     
-    def extract_block_diagrams(self, soup):
-        block_diagrams = []
-        all_links = soup.find_all('a', href=True)
-        
-        for link in all_links:
-            href = link.get('href', '')
-            if 'static1.squarespace.com' in href or 'squarespace-cdn.com' in href:
-                if '?format=' in href or href.endswith(('.png', '.jpg', '.jpeg', '.gif')):
-                    full_url = urljoin(self.url, href)
-                    if full_url not in block_diagrams:
-                        block_diagrams.append(full_url)
-        
-        return block_diagrams
-    
     def scrape_product_detail_page(self, soup):
         products = {}
         
         product_name = None
-        h1_tag = soup.find('h1')
-        if h1_tag:
-            product_name = h1_tag.get_text(strip=True)
+        og_desc = None
+        og_image = None
+        paragraphs = []
+        specs = {}
+        
+        # Block diagrams linked with <a> come first, PNG <img> tags are added after them
+        block_diagrams = []
+        png_images = []
+        # Sets mirror the lists for constant-time duplicate checks
+        bd_set = set()
+        png_set = set()
+        images = []
+        img_set = set()
+        
+        # Visit the document once and dispatch on the tag name
+        for tag in soup.find_all(['h1', 'meta', 'p', 'li', 'a', 'img']):
+            name = tag.name
+            
+            if name == 'h1':
+                if product_name is None:
+                    product_name = tag.get_text(strip=True)
+            
+            elif name == 'meta':
+                prop = tag.get('property')
+                if prop == 'og:description' and og_desc is None:
+                    og_desc = tag
+                elif prop == 'og:image' and og_image is None:
+                    og_image = tag
+            
+            elif name == 'p':
+                paragraphs.append(tag)
+            
+            elif name == 'li':
+                # Only list items inside a <ul> hold specifications
+                if tag.find_parent('ul') is None:
+                    continue
+                text = tag.get_text(strip=True)
+                if ':' in text:
+                    key, value = text.split(':', 1)
+                    specs[key.strip()] = value.strip()
+            
+            elif name == 'a':
+                href = tag.get('href')
+                if href is None:
+                    continue
+                if 'static1.squarespace.com' in href or 'squarespace-cdn.com' in href:
+                    if '?format=' in href or href.endswith(('.png', '.jpg', '.jpeg', '.gif')):
+                        full_url = urljoin(self.url, href)
+                        if full_url not in bd_set:
+                            bd_set.add(full_url)
+                            block_diagrams.append(full_url)
+            
+            else:
+                img_url = tag.get('data-src') or tag.get('src')
+                if img_url and ('squarespace-cdn.com' in img_url or 'static1.squarespace.com' in img_url):
+                    img_url = urljoin(self.url, img_url)
+                    
+                    # Check extension to separate block diagrams (PNG) from product images
+                    if _url_ext(img_url) in self._PNG_EXTS:
+                        if img_url not in png_set and not self.is_logo_image(img_url):
+                            png_set.add(img_url)
+                            png_images.append(img_url)
+                    else:
+                        if img_url not in img_set and not self.is_logo_image(img_url):
+                            img_set.add(img_url)
+                            images.append(img_url)
+        
+        for img_url in png_images:
+            if img_url not in bd_set:
+                bd_set.add(img_url)
+                block_diagrams.append(img_url)
         
         description = None
-        og_desc = soup.find('meta', property='og:description')
         if og_desc:
             description = og_desc.get('content')
         
         if not description:
-            paragraphs = soup.find_all('p')
             desc_parts = []
             for p in paragraphs:
                 text = p.get_text(strip=True)
@@ -205,20 +402,9 @@ class KiloWebScraper:
                 description = ' '.join(desc_parts)
         
         image_url = None
-        og_image = soup.find('meta', property='og:image')
         if og_image:
             image_url = og_image.get('content')
         
-        specs = {}
-        lists = soup.find_all('ul')
-        for ul in lists:
-            items = ul.find_all('li')
-            for item in items:
-                text = item.get_text(strip=True)
-                if ':' in text:
-                    key, value = text.split(':', 1)
-                    specs[key.strip()] = value.strip()
-        
         if product_name:
             products[product_name] = {
                 'Product': product_name,
@@ -230,68 +416,99 @@ class KiloWebScraper:
                 'pdf_filename': None
             }
         
-        block_diagrams = self.extract_block_diagrams(soup)
-        
-        images = []
-        all_images = soup.find_all('img')
-        for img in all_images:
-            img_url = img.get('data-src') or img.get('src')
-            if img_url and ('squarespace-cdn.com' in img_url or 'static1.squarespace.com' in img_url):
-                img_url = urljoin(self.url, img_url)
-                
-                # Check extension to separate block diagrams (PNG) from product images
-                parsed = urlparse(img_url)
-                path = parsed.path.lower()
-                
-                if path.endswith('.png'):
-                    if img_url not in block_diagrams and not self.is_logo_image(img_url):
-                        block_diagrams.append(img_url)
-                else:
-                    if img_url not in images and not self.is_logo_image(img_url):
-                        images.append(img_url)
-        
         return products, images, block_diagrams
     
+    def _conditional_headers(self, url, save_dir):
+        """Build If-None-Match/If-Modified-Since headers for a file already on disk"""
+        # Only a file recorded for this URL can be revalidated; other URLs may share its name
+        record = self.validators.get(url)
+        if not record or not record.get('name'):
+            return None, {}
+
+        filename = record['name']
+        filepath = save_dir / filename
+        if not filepath.exists():
+            return None, {}
+
+        headers = {}
+        if record.get('etag'):
+            headers['If-None-Match'] = record['etag']
+        if record.get('last_modified'):
+            headers['If-Modified-Since'] = record['last_modified']
+        else:
+            headers['If-Modified-Since'] = formatdate(filepath.stat().st_mtime, usegmt=True)
+        return filename, headers
+
     def download_file(self, url, save_dir):
         """Download file (image or other) and return filename"""
         try:
-            response = self.session.get(url, timeout=30)
-            response.raise_for_status()
-
-            # Extract filename from URL
-            parsed = urlparse(url)
-            filename = os.path.basename(parsed.path.split('?')[0])  # Remove query parameters
-
-            # If filename doesn't have extension, add one
-            if not os.path.splitext(filename)[1]:
-                content_type = response.headers.get('content-type', '')
-                if 'jpeg' in content_type or 'jpg' in content_type:
-                    filename += '.jpg'
-                elif 'png' in content_type:
-                    filename += '.png'
-                elif 'gif' in content_type:
-                    filename += '.gif'
-                else:
-                    filename += '.jpg'
-
-            # If still no filename, generate one
-            if not filename or filename == '.jpg':
-                filename = f"image-{hash(url) % 10000}.jpg"
-
-            # Handle filename conflicts
-            filepath = save_dir / filename
-            counter = 1
-            base_name = os.path.splitext(filename)[0]
-            ext = os.path.splitext(filename)[1]
-
-            while filepath.exists():
-                filename = f"{base_name}({counter}){ext}"
-                filepath = save_dir / filename
-                counter += 1
-
-            # Save file
-            with open(filepath, 'wb') as f:
-                f.write(response.content)
+            existing_filename, headers = self._conditional_headers(url, save_dir)
+            with self.session.get(url, headers=headers, stream=True, timeout=30) as response:
+                # File on disk is still current
+                if response.status_code == 304 and existing_filename:
+                    return existing_filename
+
+                response.raise_for_status()
+                self.validators[url] = {
+                    'etag': response.headers.get('ETag'),
+                    'last_modified': response.headers.get('Last-Modified')
+                }
+
+                # Extract filename from URL
+                parsed = urlparse(url)
+                filename = os.path.basename(parsed.path.split('?')[0])  # Remove query parameters
+
+                # If filename doesn't have extension, add one
+                if not os.path.splitext(filename)[1]:
+                    content_type = response.headers.get('content-type', '')
+                    if 'jpeg' in content_type or 'jpg' in content_type:
+                        filename += '.jpg'
+                    elif 'png' in content_type:
+                        filename += '.png'
+                    elif 'gif' in content_type:
+                        filename += '.gif'
+                    else:
+                        filename += '.jpg'
+
+                # If still no filename, generate a stable one from the URL
+                if not filename or filename == '.jpg':
+                    digest = hashlib.blake2b(url.encode(), digest_size=8).hexdigest()
+                    filename = f"image-{digest}.jpg"
+
+                # A 200 to a conditional GET means the recorded file changed; overwrite it
+                if existing_filename:
+                    filename = existing_filename
+
+                with self._file_lock:
+                    if save_dir not in self._dir_index:
+                        with os.scandir(save_dir) as entries:
+                            self._dir_index[save_dir] = {entry.name for entry in entries}
+                    names = self._dir_index[save_dir]
+
+                    # Handle filename conflicts
+                    counter = 1
+                    base_name = os.path.splitext(filename)[0]
+                    ext = os.path.splitext(filename)[1]
+
+                    while filename in names and filename != existing_filename:
+                        filename = f"{base_name}({counter}){ext}"
+                        counter += 1
+                    filepath = save_dir / filename
+
+                    # Opening the file reserves the name for other downloads
+                    f = open(filepath, 'wb', buffering=1 << 20)
+                    names.add(filename)
+
+                # Stream file to disk in chunks
+                try:
+                    with f:
+                        for chunk in response.iter_content(chunk_size=65536):
+                            f.write(chunk)
+                except Exception:
+                    filepath.unlink(missing_ok=True)
+                    with self._file_lock:
+                        names.discard(filename)
+                    raise
 
             return filename
 
@@ -299,23 +516,42 @@ class KiloWebScraper:
             print(f"Error downloading file {url}: {e}")
             return None
 
+    def _download_all(self, urls, save_dir, label):
+        """Download files on a thread pool and return (url, filename) pairs in input order"""
+        def download(url):
+            print(f"Downloading {label}: {url}")
+            return url, self.download_file(url, save_dir)
+
+        with ThreadPoolExecutor(max_workers=self.MAX_CONCURRENT_DOWNLOADS) as executor:
+            return list(executor.map(download, urls))
+
+    @staticmethod
+    def _read_json(filepath):
+        """Read a JSON file, using orjson when available"""
+        if orjson is not None:
+            return orjson.loads(filepath.read_bytes())
+        with open(filepath, 'r', encoding='utf-8') as f:
+            return json.load(f)
+
     def load_existing_metadata(self, filepath):
-        """Load existing metadata.json file"""
+        """Load existing metadata.json file as a dict keyed by URL"""
         if filepath.exists():
             try:
-                with open(filepath, 'r', encoding='utf-8') as f:
-                    return json.load(f)
+                data = self._read_json(filepath)
             except Exception as e:
                 print(f"Error loading {filepath}: {e}")
-                return []
-        return []
+                return {}
+            # Older files store a list of records
+            if isinstance(data, list):
+                return {item['url']: item for item in data}
+            return data
+        return {}
 
     def load_existing_products(self, filepath):
         """Load existing products.json file"""
         if filepath.exists():
             try:
-                with open(filepath, 'r', encoding='utf-8') as f:
-                    return json.load(f)
+                return self._read_json(filepath)
             except Exception as e:
                 print(f"Error loading {filepath}: {e}")
                 return {}
@@ -324,6 +560,9 @@ class KiloWebScraper:
     def save_json(self, data, filepath):
         """Save data to JSON file"""
         filepath.parent.mkdir(parents=True, exist_ok=True)
+        if orjson is not None:
+            filepath.write_bytes(orjson.dumps(data, option=orjson.OPT_INDENT_2 | orjson.OPT_NON_STR_KEYS))
+            return
         with open(filepath, 'w', encoding='utf-8') as f:
             json.dump(data, f, indent=4, ensure_ascii=False)
 
@@ -338,16 +577,19 @@ class KiloWebScraper:
             return str(html)
         return str(html)
     
-    @staticmethod
-    def clean_html_spaces(text: str) -> str:
+    @classmethod
+    def clean_html_spaces(cls, text: str) -> str:
         """Clean HTML spaces and normalize whitespace"""
         if not text:
             return ""
-        return (
-            text.replace("&nbsp;", " ")   # replace HTML non-breaking spaces
-                .replace("\xa0", " ")     # replace unicode non-breaking spaces
-                .replace("\u00a0", " ")   # extra safety
-        )
+        # replace HTML non-breaking spaces, then unicode non-breaking spaces
+        return text.replace("&nbsp;", " ").translate(cls._NBSP_TRANS)
+
+    @staticmethod
+    def _normalize_newlines(match):
+        """Collapse 3+ newlines to one blank line; surrounding spaces are dropped"""
+        newlines = match.group(1)
+        return "\n\n" if len(newlines) >= 3 else newlines
 
     def write_overview_markdown(self, soup, div_selector, section_title=None, url=None):
         """Convert HTML section to markdown with enhanced processing"""
@@ -368,7 +610,7 @@ class KiloWebScraper:
         # Convert onclick buttons to links
         for btn in div.select("button[onclick]"):
             onclick = btn.get("onclick", "")
-            m = re.search(r"location\.href\s*=\s*['\"]([^'\"]+)['\"]", onclick)
+            m = self._ONCLICK_HREF_RE.search(onclick)
             if not m:
                 continue
  
@@ -387,22 +629,19 @@ class KiloWebScraper:
  
             btn.replace_with(a)
  
-        html_content = div.decode_contents().strip()
-        if not html_content:
+        # Skip sections that hold nothing but whitespace
+        if not any(not isinstance(child, NavigableString) or child.strip() for child in div.contents):
             return ""
  
-        # Convert HTML → Markdown
-        markdown_text = md.markdownify(html_content, heading_style="ATX")
+        # Convert HTML → Markdown straight from the parsed tree
+        markdown_text = self._MARKDOWN_CONVERTER.convert_soup(div)
  
         # Clean up and normalize whitespace
         markdown_text = self._html_to_str(markdown_text)
         markdown_text = self.clean_html_spaces(markdown_text)
  
-        # 🔹 Remove excessive blank lines (3+ → 1)
-        markdown_text = re.sub(r"\n{3,}", "\n\n", markdown_text.strip())
- 
-        # 🔹 Trim leading/trailing spaces per line
-        markdown_text = "\n".join(line.strip() for line in markdown_text.splitlines())
+        # 🔹 Remove excessive blank lines (3+ → 1) and trim spaces per line in one pass
+        markdown_text = self._NORMALIZE_RE.sub(self._normalize_newlines, markdown_text.strip())
  
         # Add section title if provided
         if section_title:
@@ -412,7 +651,7 @@ class KiloWebScraper:
  
         return section_header + markdown_text.strip() + "\n"
 
-    def save_markdown(self, soup, page_type):
+    def save_markdown(self, soup, page_type, html):
         """Convert HTML to markdown and save in markdowns folder"""
         markdowns_dir = self.output_dir / 'markdowns'
 
@@ -426,6 +665,10 @@ class KiloWebScraper:
             selector = "#page-wrapper .container .main-content"
             section_title = "Product Details"
 
+        # Without the section the whole page is converted, which needs the unstrained document
+        if not soup.select_one(selector):
+            soup = self.parse_html(html, strained=False)
+
         # Generate markdown content using the enhanced method
         markdown_content = self.write_overview_markdown(soup, selector, section_title, self.url)
 
@@ -450,15 +693,16 @@ class KiloWebScraper:
             print("Failed to fetch page")
             return False
 
-        soup = BeautifulSoup(html, 'html.parser')
-        page_type = self.detect_page_type(soup)
+        soup = self.parse_html(html)
+        tree = self.parse_tree(html)
+        page_type, product_list = self.detect_page_type(soup, tree)
 
         print(f"Detected page type: {page_type}")
 
         # Scrape based on page type
         block_diagrams = []
         if page_type == 'category':
-            products, images, block_diagrams = self.scrape_category_page(soup)
+            products, images, block_diagrams = self.scrape_category_page(soup, product_list, tree)
         else:
             products, images, block_diagrams = self.scrape_product_detail_page(soup)
 
@@ -481,73 +725,81 @@ class KiloWebScraper:
         existing_products = self.load_existing_products(products_file)
         existing_block_diagrams_metadata = self.load_existing_metadata(block_diagrams_mappings_file)
 
-        # Track existing URLs to avoid duplicates
-        existing_image_urls = {item['url'] for item in existing_images_metadata}
-        existing_block_diagram_urls = {item['url'] for item in existing_block_diagrams_metadata}
+        # Validators from earlier runs let unchanged files come back as 304 Not Modified
+        for item in existing_products.get('images', []):
+            self.validators[item['url']] = item
+        for url, item in self.load_existing_metadata(block_diagrams_metadata_file).items():
+            self.validators[url] = item
 
         # Download and track new images
-        new_image_metadata = []
+        new_image_urls = []
         for img_url in images:
-            if img_url in existing_image_urls:
+            if img_url in existing_images_metadata:
                 print(f"Skipping existing image: {img_url}")
                 continue
+            new_image_urls.append(img_url)
 
-            print(f"Downloading image: {img_url}")
-            filename = self.download_file(img_url, images_dir)
-
+        new_image_metadata = {}
+        for img_url, filename in self._download_all(new_image_urls, images_dir, 'image'):
             if filename:
-                new_image_metadata.append({
+                new_image_metadata[img_url] = {
                     'name': filename,
                     'url': img_url,
                     'file_path': f"{self.output_dir}/images/{filename}",
                     'version': None,
                     'date': None,
                     'language': None,
-                    'description': None
-                })
+                    'description': None,
+                    'etag': self.validators.get(img_url, {}).get('etag'),
+                    'last_modified': self.validators.get(img_url, {}).get('last_modified')
+                }
 
         # Download and track block diagrams
-        new_block_diagram_metadata = []
+        new_block_diagram_urls = []
         for bd_url in block_diagrams:
-            if bd_url in existing_block_diagram_urls:
+            if bd_url in existing_block_diagrams_metadata:
                 print(f"Skipping existing block diagram: {bd_url}")
                 continue
+            new_block_diagram_urls.append(bd_url)
 
-            print(f"Downloading block diagram: {bd_url}")
-            filename = self.download_file(bd_url, block_diagrams_dir)
-
+        new_block_diagram_metadata = {}
+        for bd_url, filename in self._download_all(new_block_diagram_urls, block_diagrams_dir, 'block diagram'):
             if filename:
-                new_block_diagram_metadata.append({
+                new_block_diagram_metadata[bd_url] = {
                     'name': filename,
                     'url': bd_url,
                     'file_path': f"{self.output_dir}/block_diagrams/{filename}",
                     'version': None,
                     'date': None,
                     'language': None,
-                    'description': None
-                })
+                    'description': None,
+                    'etag': self.validators.get(bd_url, {}).get('etag'),
+                    'last_modified': self.validators.get(bd_url, {}).get('last_modified')
+                }
 
         # Merge and save image metadata
-        all_images_metadata = existing_images_metadata + new_image_metadata
-        self.save_json(all_images_metadata, images_metadata_file)
-        print(f"Saved {len(all_images_metadata)} total images to metadata")
+        existing_images_metadata.update(new_image_metadata)
+        self.save_json(existing_images_metadata, images_metadata_file)
+        print(f"Saved {len(existing_images_metadata)} total images to metadata")
 
         # Merge and save block diagram metadata
-        all_block_diagrams_metadata = existing_block_diagrams_metadata + new_block_diagram_metadata
-        self.save_json(all_block_diagrams_metadata, block_diagrams_mappings_file)
-        print(f"Saved {len(all_block_diagrams_metadata)} total block diagrams")
+        existing_block_diagrams_metadata.update(new_block_diagram_metadata)
+        self.save_json(existing_block_diagrams_metadata, block_diagrams_mappings_file)
+        # Keep a copy of the records so their validators survive a deleted mappings file
+        self.save_json(existing_block_diagrams_metadata, block_diagrams_metadata_file)
+        print(f"Saved {len(existing_block_diagrams_metadata)} total block diagrams")
 
         # Merge and save products
         existing_products.update(products)
         
         # Add image metadata to products.json
-        existing_products['images'] = all_images_metadata
+        existing_products['images'] = list(existing_images_metadata.values())
         
         self.save_json(existing_products, products_file)
-        print(f"Saved {len(existing_products)} total products with {len(all_images_metadata)} images")
+        print(f"Saved {len(existing_products)} total products with {len(existing_images_metadata)} images")
 
         # Save markdown file
-        self.save_markdown(soup, page_type)
+        self.save_markdown(soup, page_type, html)
 
         print(f"\nScraping complete! Data saved to: {self.output_dir}")
         return True